@@ -5,8 +5,6 @@ from .dbs import (HTTPDatabase, InMemoryDatabase, SQLDatabase,
 from .errors import (ChairDBError, Forbidden, NotFound, PreconditionFailed,
                      Unauthorized)
 from .replicator import replicate
-from .server import app
-from .server.db import build_db_app
 from .view import View
 from .utils import anext
 from .sqlitepool import sqlite_pool
@@ -44,3 +42,17 @@ __all__ = (
     'anext',
     'sqlite_pool',
 )
+
+
+def __getattr__(name):
+    """The server (and with it, starlette) is only imported on first use, as
+    users of just the database APIs don't need it.
+
+    """
+    if name == 'app':
+        from .server import app
+        return app
+    if name == 'build_db_app':
+        from .server.db import build_db_app
+        return build_db_app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
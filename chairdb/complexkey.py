@@ -116,6 +116,17 @@ def serialize_object(object, stack):
         stack.append(key)
 
 
+# immutable, so they can be shared between parsed keys
+CONSTANTS = {
+    NONE: None,
+    FALSE: False,
+    TRUE: True,
+    ZERO: 0,
+    EMPTY_STRING: '',
+}
+EMPTY_CONTAINERS = {EMPTY_ARRAY: list, EMPTY_OBJECT: dict}
+
+
 def parse_complex_key(value):
     stack = [[]]
     i = 0
@@ -123,16 +134,7 @@ def parse_complex_key(value):
         tag = value[i]
         i += 1
         try:
-            # constants
-            stack[-1].append({
-                NONE: None,
-                FALSE: False,
-                TRUE: True,
-                ZERO: 0,
-                EMPTY_STRING: '',
-                EMPTY_ARRAY: [],
-                EMPTY_OBJECT: {},
-            }[tag])
+            stack[-1].append(CONSTANTS[tag])
         except KeyError:
             i = parse_complex_tag(value, i, tag, stack)
     assert len(stack) == 1 and len(stack[0]) == 1
@@ -167,6 +169,8 @@ def parse_value_tag(value, i, tag, stack):
         string, delta_i = deserialize_str(value, i)
         stack[-1].append(string)
         i += delta_i
+    elif tag in EMPTY_CONTAINERS:
+        stack[-1].append(EMPTY_CONTAINERS[tag]())
     else:
         raise ValueError(f'Unknown tag: {tag}')
     return i
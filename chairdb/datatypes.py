@@ -1,3 +1,5 @@
+import orjson
+
 import base64
 import hashlib
 import json
@@ -102,7 +104,9 @@ class Document(AbstractDocument):
         self.attachments[name] = attachment
 
     def update_rev(self):
-        hash = hashlib.md5()
+        # the hash is only used to generate a unique revision, so the faster
+        # blake2b is used. The digest size keeps it as long as an md5 one.
+        hash = hashlib.blake2b(digest_size=16)
         id = self.id
         if isinstance(id, str):
             id = id.encode('UTF-8')
@@ -111,7 +115,7 @@ class Document(AbstractDocument):
         for prev_hash in self.path:
             hash.update(prev_hash.encode('UTF-8'))
         hash.update(str(self.is_deleted).encode('UTF-8'))
-        hash.update(json.dumps(self.body).encode('UTF-8'))
+        hash.update(self._encode_body(self.body))
         for name, att in self.attachments.items():
             hash.update(name.encode('UTF-8'))
             hash.update(self._encode_int(att.meta.rev_pos))
@@ -125,6 +129,13 @@ class Document(AbstractDocument):
     def _encode_int(self, num):
         return num.to_bytes(8, 'big')
 
+    def _encode_body(self, body):
+        try:
+            return orjson.dumps(body, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which only json can encode
+            return json.dumps(body).encode('UTF-8')
+
 
 class NewAttachment:
     is_stub = False
@@ -13,6 +13,9 @@ from .revtree import RevisionTree
 from .attachments import update_atts, chunk_id, read_atts, slice_att
 
 
+DEFAULT_REVS_LIMIT = 1000
+
+
 class AbstractDatabase:
     """An implementation of a CouchDB-compatible database.
 
@@ -61,16 +64,25 @@ class AbstractDatabase:
         async with anyio.create_task_group() as tg:
             yield WriteTransaction(tg, self._backend, actions)
         async with self._backend.write_transaction() as t:
-            for action, *args in actions:
-                if action == 'write_local':
-                    t.write_local(*args)
-                else:
-                    await self._write_impl(t, *args)
+            await self._apply(t, actions)
         self._updated()
 
-    async def _write_impl(self, t, chunk_info, doc, check_conflict):
+    async def _apply(self, t, actions):
+        # look up what the writes need once, instead of once per document
+        trees = await t.read_many(written_ids(actions))
+        revs_limit = await get_revs_limit(t)
+        for action, *args in actions:
+            if action == 'write_local':
+                t.write_local(*args)
+                if args[0] == '_revs_limit':
+                    revs_limit = args[1] or DEFAULT_REVS_LIMIT
+            else:
+                await self._write_impl(t, trees, revs_limit, *args)
+
+    async def _write_impl(self, t, trees, revs_limit, chunk_info, doc,
+                          check_conflict):
         # get the new document's path and check if it replaces something
-        tree = await get_rev_tree(t, doc.id)
+        tree = trees.setdefault(doc.id, RevisionTree())
         state, *args = tree.merge_with_path(doc.rev_num, doc.path)
 
         # states: already_inserted, replace_insert, fork_insert, new_insert
@@ -96,7 +108,7 @@ class AbstractDatabase:
             t.write_local(f'_att_store_{doc_ptr}', att_store)
 
         # insert or replace in the rev tree
-        tree.update(await get_revs_limit(t), doc_ptr, doc.rev_num, *args)
+        tree.update(revs_limit, doc_ptr, doc.rev_num, *args)
 
         t.write(doc.id, tree)
 
@@ -125,7 +137,10 @@ class ReadTransaction:
                        doc_opts=dict(body=False, atts=None)):
         rows = self._t.all_docs(start_key, end_key, descending)
         async for id, rev_tree in rows:
-            for branch in all_docs_branch(rev_tree):
+            # only the winner is needed per row, so look it up directly
+            # instead of going through a generator
+            branch = rev_tree.winner()
+            if branch.leaf_doc_ptr:  # not deleted
                 yield await self._read_doc(id, branch, **doc_opts)
 
     def all_local_docs(self, *, start_key=None, end_key=None,
@@ -133,8 +148,17 @@ class ReadTransaction:
         return self._t.all_local_docs(start_key, end_key, descending)
 
     async def changes(self, since=None):
-        async for seq, id, rev_tree in self._t.changes(since):
-            yield build_change(id, seq, rev_tree)
+        async for batch in self.change_batches(since):
+            for change in batch:
+                yield change
+
+    async def change_batches(self, since=None):
+        """Like changes(), but gives lists of changes. That saves a few
+        generator round trips per change for consumers that handle many.
+
+        """
+        async for rows in self._t.change_batches(since):
+            yield [build_change(id, seq, tree) for seq, id, tree in rows]
 
     async def read(self, id, *, revs=None, body=True,
                    atts=AttachmentSelector()):
@@ -167,13 +191,12 @@ class ReadTransaction:
 
 
 async def get_revs_limit(t):
-    return await t.read_local('_revs_limit') or 1000  # default
+    return await t.read_local('_revs_limit') or DEFAULT_REVS_LIMIT
 
 
-def all_docs_branch(rev_tree):
-    branch = rev_tree.winner()
-    if branch.leaf_doc_ptr:  # not deleted
-        yield branch
+def written_ids(actions):
+    return list({args[1].id: None for action, *args in actions
+                 if action == 'write'})
 
 
 def build_change(id, seq, rev_tree):
@@ -225,10 +248,12 @@ class Attachment(typing.NamedTuple):
         sk, ek, start_offset, end_offset, last_i = slice_att(self.data_ptr, s)
 
         rows = self.t.all_local_docs(start_key=sk, end_key=ek)
-        async for i, (id, blob) in aenumerate(rows):
-            start = start_offset if i == 0 else None
+        start, i = start_offset, 0
+        async for id, blob in rows:
             end = end_offset if i == last_i else None
             yield blob[start:end]
+            start = None
+            i += 1
 
 
 class WriteTransaction:
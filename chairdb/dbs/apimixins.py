@@ -47,6 +47,15 @@ class TransactionBasedDBMixin:
     write = writer_proxy('write')
     write_local = writer_proxy('write_local')
 
+    async def write_many(self, docs):
+        """Like calling write() for each document in 'docs', but using a single
+        write transaction.
+
+        """
+        async with self.write_transaction() as t:
+            for doc in docs:
+                t.write(doc)
+
     async def all_docs(self, **opts):
         verify_no_attachments(opts.get('doc_opts', {}))
 
@@ -92,10 +101,10 @@ class TransactionBasedDBMixin:
             async for doc in t.read(id, **opts):
                 yield doc
 
-    async def _changes(self, since=None):
+    async def _change_batches(self, since=None):
         async with self.read_transaction() as t:
-            async for change in t.changes(since):
-                yield change
+            async for batch in t.change_batches(since):
+                yield batch
 
     async def read_local(self, id):
         async with self.read_transaction() as t:
@@ -117,7 +126,8 @@ class TransactionBasedDBMixin:
 class ContinuousChangesMixin:
     """Requires the following to be implemented:
 
-    - (async) self._changes(since), which gives changes non-continuously
+    - (async) self._change_batches(since), which gives lists of changes
+      non-continuously
 
     Also requires that the caller calls:
 
@@ -125,23 +135,60 @@ class ContinuousChangesMixin:
 
     """
     def _updated(self):
+        # nothing to do (or allocate) for writes without continuous listeners,
+        # as those always wait for an update before sharing any changes.
         if hasattr(self, '_update_event'):
             self._update_event.set()
             del self._update_event
+            self._shared_changes = {}
+
+    def _next_update(self):
+        if not hasattr(self, '_update_event'):
+            self._update_event = anyio.Event()
+        return self._update_event
 
     async def changes(self, since=None, continuous=False):
         """"Like CouchDB's _changes with style=all_docs"""
 
-        while True:
-            # send (new) changes to the caller
-            async for change in self._changes(since):
+        # start listening before sending anything, so no updates are missed
+        update = continuous and self._next_update()
+        async for batch in self._change_batches(since):
+            for change in batch:
+                yield change
+            since = batch[-1].seq  # batches are never empty
+
+        while update:
+            # wait for new changes to come available, then send those too
+            await update.wait()
+            update = self._next_update()
+            for change in await self._new_changes(since):
                 since = change.seq
                 yield change
 
-            if not continuous:
-                # stop immediately.
-                break
-            # wait for new changes to come available, then loop
-            if not hasattr(self, '_update_event'):
-                self._update_event = anyio.Event()
-            await self._update_event.wait()
+    async def _new_changes(self, since):
+        # all continuous listeners are woken up by the same update, and those
+        # that were up-to-date all need the same changes. So read them only
+        # once.
+        shared = self._shared_changes
+        if since not in shared:
+            shared[since] = SharedChanges(self._change_batches, since)
+        return await shared[since].get()
+
+
+class SharedChanges:
+    """The result of a single (lazy) self._change_batches(since) call, which
+    can be awaited by multiple listeners.
+
+    """
+    def __init__(self, change_batches, since):
+        self._change_batches = change_batches
+        self._since = since
+        self._lock = anyio.Lock()
+        self._result = None
+
+    async def get(self):
+        async with self._lock:
+            if self._result is None:
+                batches = self._change_batches(self._since)
+                self._result = [c async for batch in batches for c in batch]
+        return self._result
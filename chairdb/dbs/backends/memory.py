@@ -1,6 +1,7 @@
 import anyio
 import sortedcontainers
 
+import bisect
 import contextlib
 import copy
 import uuid
@@ -8,6 +9,9 @@ import uuid
 from ...errors import NotFound
 from ...utils import as_future_result
 
+# the amount of changes passed on at once by ReadTransaction.change_batches()
+CHANGES_BATCH_SIZE = 256
+
 
 class InMemoryBackend:
     """In-memory storage. Just implements read/write transactions for local
@@ -23,8 +27,9 @@ class InMemoryBackend:
         self._local = sortedcontainers.SortedDict()
         # id -> (rev_tree, last_update_seq)
         self._byid = sortedcontainers.SortedDict()
-        # seq -> id (str)
-        self._byseq = sortedcontainers.SortedDict()
+        # seq -> id (str), as two parallel lists sorted by seq. Seqs only
+        # grow, so new entries can just be appended.
+        self._byseq = [], []
 
     @contextlib.asynccontextmanager
     async def read_transaction(self):
@@ -38,8 +43,9 @@ class InMemoryBackend:
         async with self._write_lock:
             # replace indices with copies such that current readers keep access
             # to the 'old' state
+            seqs, ids = self._byseq
             t = WriteTransaction(self._local.copy(), self._byid.copy(),
-                                 self._byseq.copy(), self._update_seq)
+                                 (seqs.copy(), ids.copy()), self._update_seq)
             yield t
             # overwrite indices
             self._byid = t._byid
@@ -57,6 +63,11 @@ async def _read(self, id):
     return tree
 
 
+async def _read_many(self, ids):
+    byid = self._byid
+    return {id: byid[id][0] for id in ids if id in byid}
+
+
 async def _read_local(self, id):
     return copy.deepcopy(self._local.get(id))  # allow modification
 
@@ -73,9 +84,9 @@ class ReadTransaction:
         return as_future_result(self._update_seq)
 
     async def all_docs(self, start_key, end_key, descending):
-        iter = self._byid.irange(start_key, end_key, reverse=descending)
-        for id in iter:
-            tree, _ = self._byid[id]
+        byid = self._byid
+        for id in byid.irange(start_key, end_key, reverse=descending):
+            tree, _ = byid[id]
             yield id, tree
 
     async def all_local_docs(self, start_key, end_key, descending):
@@ -83,19 +94,21 @@ class ReadTransaction:
         for id in iter:
             yield id, self._local[id]
 
-    async def changes(self, since):
+    async def change_batches(self, since):
         """If we ever support style='main_only' then storing winner metadata in
         the byseq index would make sense. Now, not so much. We need to query
         the by_id index for the revision tree anyway...
 
         """
-        for seq in self._byseq.irange(minimum=since, inclusive=(False, False)):
-            id = self._byseq[seq]
-            rev_tree, _ = self._byid[id]
-
-            yield seq, id, rev_tree
+        seqs, ids, byid = *self._byseq, self._byid
+        start = bisect.bisect_right(seqs, since or 0)
+        for i in range(start, len(seqs), CHANGES_BATCH_SIZE):
+            j = i + CHANGES_BATCH_SIZE
+            yield [(seq, id, byid[id][0])
+                   for seq, id in zip(seqs[i:j], ids[i:j])]
 
     read = _read
+    read_many = _read_many
     read_local = _read_local
 
 
@@ -107,16 +120,20 @@ class WriteTransaction:
         self._update_seq = update_seq
 
     read = _read
+    read_many = _read_many
     read_local = _read_local
 
     def write(self, id, tree):
         self._update_seq += 1
-        with contextlib.suppress(KeyError):
-            _, last_update_seq = self._byid[id]
-            del self._byseq[last_update_seq]
+        seqs, ids = self._byseq
         # update the by seq index by first removing a previous reference to the
         # current document (if there is one), and then inserting a new one.
-        self._byseq[self._update_seq] = id
+        with contextlib.suppress(KeyError):
+            _, last_update_seq = self._byid[id]
+            i = bisect.bisect_left(seqs, last_update_seq)
+            del seqs[i], ids[i]
+        seqs.append(self._update_seq)
+        ids.append(id)
         # actual insertion by updating the document info in the indices
         self._byid[id] = tree, self._update_seq
 
@@ -1,11 +1,13 @@
+import orjson
+
 import contextlib
+import copy
 import functools
-import json
 import sqlite3
 
 from ..revtree import RevisionTree, Branch
 from ...errors import NotFound
-from ...utils import as_json
+from ...utils import as_json, json_loads
 
 TABLE_CREATE = [
     """CREATE TABLE revision_trees (
@@ -58,10 +60,14 @@ READ_LOCAL = "SELECT is_json, data FROM local_documents WHERE id=:id"
 DELETE_LOCAL = "DELETE FROM local_documents WHERE id=:id"
 
 READ = "SELECT rev_tree FROM revision_trees WHERE id=:id"
+READ_MANY = "SELECT id, rev_tree FROM revision_trees WHERE id IN ({})"
 WRITE = f"""INSERT OR REPLACE INTO revision_trees VALUES (:id, :rev_tree,
     ({UPDATE_SEQ}) + 1
 )"""
 
+# the amount of rows fetched per round trip to the sqlite thread
+ROWS_PER_FETCH = 256
+
 
 class SQLBackend:
     """SQLite storage. Just implements read/write transactions for local docs
@@ -105,6 +111,19 @@ async def _read(self, id):
         raise NotFound(id) from e
 
 
+async def _read_many(self, ids):
+    """The rev trees of those 'ids' that exist, by id."""
+
+    trees = {}
+    for i in range(0, len(ids), ROWS_PER_FETCH):
+        batch = ids[i:i + ROWS_PER_FETCH]
+        query = READ_MANY.format(', '.join('?' * len(batch)))
+        async with self._tx.execute(query, batch) as cursor:
+            for id, tree in await cursor.fetchall():
+                trees[id] = decode_tree(tree)
+    return trees
+
+
 async def _read_local(self, id):
     async with self._tx.execute(READ_LOCAL, {'id': id}) as cursor:
         with contextlib.suppress(TypeError):
@@ -124,12 +143,16 @@ class ReadTransaction:
             return (await cursor.fetchone())[0]
 
     async def _rows(self, cursor):
+        async for rows in self._row_batches(cursor):
+            for row in rows:
+                yield row
+
+    async def _row_batches(self, cursor):
         while True:
-            rows = await cursor.fetchmany()
+            rows = await cursor.fetchmany(ROWS_PER_FETCH)
             if not rows:
                 return
-            for row in rows:
-                yield row
+            yield rows
 
     async def all_docs(self, start_key, end_key, descending):
         query = all_docs_query(start_key, end_key, descending)
@@ -145,12 +168,13 @@ class ReadTransaction:
             async for id, *args in self._rows(cursor):
                 yield id, decode_local(*args)
 
-    async def changes(self, since=None):
+    async def change_batches(self, since=None):
         async with self._tx.execute(CHANGES, {'since': since or 0}) as cursor:
-            async for seq, id, tree in self._rows(cursor):
-                yield seq, id, decode_tree(tree)
+            async for rows in self._row_batches(cursor):
+                yield [(seq, id, decode_tree(tree)) for seq, id, tree in rows]
 
     read = _read
+    read_many = _read_many
     read_local = _read_local
 
 
@@ -160,8 +184,12 @@ class WriteTransaction:
         self.docs = []
         self.local_writes = []
         self.local_deletes = []
+        # the writes above only happen on commit, so read_local() needs this
+        # to see them earlier in the same transaction
+        self._pending_local = {}
 
     def write_local(self, id, data):
+        self._pending_local[id] = data
         result = {'id': id}
         if data is None:
             self.local_deletes.append(result)
@@ -177,16 +205,22 @@ class WriteTransaction:
     def write(self, id, tree):
         self.docs.append({'id': id, 'rev_tree': as_json(tree)})
 
+    async def read_local(self, id):
+        try:
+            return copy.deepcopy(self._pending_local[id])  # like on read
+        except KeyError:
+            return await _read_local(self, id)
+
     read = _read
-    read_local = _read_local
+    read_many = _read_many
 
 
 def decode_tree(data):
     return RevisionTree(Branch(rn, tuple(path), ptr)
-                        for rn, path, ptr in json.loads(data))
+                        for rn, path, ptr in orjson.loads(data))
 
 
 def decode_local(is_json, data):
     if is_json:
-        return json.loads(data)
+        return json_loads(data)
     return data
@@ -1,18 +1,20 @@
 import contextlib
-import json
 
 import anyio
 import httpx
+import orjson
 
 from ..errors import Unauthorized, Forbidden, NotFound
 from ..datatypes import AttachmentSelector, Change, Missing
 from ..multipart import MultipartStreamParser
 from ..utils import (as_json, couchdb_json_to_doc, doc_to_couchdb_json, anext,
-                     json_object_inner, add_http_attachments, parse_rev, rev,
-                     verify_no_attachments, parse_json_stream)
+                     add_http_attachments, parse_rev, rev,
+                     verify_no_attachments, parse_json_stream, has_small_body,
+                     async_iter, json_loads)
 
 
 JSON_REQ_HEADERS = {'Content-Type': 'application/json'}
+NO_NEW_EDITS_PARAMS = {'new_edits': False}
 MAX_CONNECTIONS = 10
 
 
@@ -32,6 +34,7 @@ class HTTPDatabase(httpx.AsyncClient):
                               max_connections=MAX_CONNECTIONS)
         super().__init__(base_url=url, limits=limits, *args, **kwargs)
 
+        self._id = None
         self._credentials = None
         if credentials:
             name, password = credentials
@@ -69,8 +72,11 @@ class HTTPDatabase(httpx.AsyncClient):
         return self._get_id()
 
     async def _get_id(self):
-        base_id = (await self._request('GET', '../')).json()['uuid']
-        return base_id + str(self.base_url) + 'remote'
+        # the server's uuid doesn't change, so only ask for it once
+        if self._id is None:
+            base_id = (await self._request('GET', '../')).json()['uuid']
+            self._id = base_id + str(self.base_url) + 'remote'
+        return self._id
 
     async def changes(self, since=None, continuous=False):
         params = {'style': 'all_docs'}
@@ -90,39 +96,68 @@ class HTTPDatabase(httpx.AsyncClient):
     async def _parse_changes_response(self, resp, continuous):
         assert resp.status_code == httpx.codes.OK
         if continuous:
-            async for line in resp.aiter_lines():
-                if line.strip():
-                    yield json.loads(line)
+            results = self._parse_continuous_changes(resp)
+        elif has_small_body(resp):
+            results = async_iter(json_loads(await resp.aread())['results'])
         else:
-            async for obj in parse_json_stream(resp.aiter_bytes(), 'items',
-                                               'results.item'):
-                yield obj
+            results = parse_json_stream(resp.aiter_bytes(), 'items',
+                                        'results.item')
+        async for obj in results:
+            yield obj
+
+    async def _parse_continuous_changes(self, resp):
+        async for line in resp.aiter_lines():
+            if line.strip():
+                # each line is a complete JSON document, so there is no need
+                # for ijson's incremental parsing
+                yield json_loads(line)
 
     async def revs_diff(self, remote):
-        items = self._revs_diff_json(remote)
-        body = self._encode_aiter(json_object_inner('{', items, lambda: '}\n'))
+        body = self._revs_diff_body(remote)
         async with self._stream('POST', '/_revs_diff', data=body,
                                 headers=JSON_REQ_HEADERS) as resp:
             assert resp.status_code == httpx.codes.OK
 
-            async for id, info in parse_json_stream(resp.aiter_bytes(),
-                                                    'kvitems', ''):
+            async for id, info in self._parse_revs_diff_response(resp):
                 missing_revs = [parse_rev(r) for r in info['missing']]
                 pa = [parse_rev(r) for r in info.get('possible_ancestors', [])]
                 yield Missing(id, missing_revs, pa)
 
-    async def _revs_diff_json(self, remote):
+    async def _parse_revs_diff_response(self, resp):
+        if has_small_body(resp):
+            results = async_iter(json_loads(await resp.aread()).items())
+        else:
+            results = parse_json_stream(resp.aiter_bytes(), 'kvitems', '')
+        async for item in results:
+            yield item
+
+    async def _revs_diff_body(self, remote):
+        # one part per document instead of buffering: during continuous
+        # replication, 'remote' might not produce the next one for a while
+        separator = b'{'
         async for id, revs in remote:
-            yield as_json(id), as_json([rev(*r) for r in revs])
-
-    async def _encode_aiter(self, aiterable):
-        async for part in aiterable:
-            yield part.encode('UTF-8')
+            revs_json = orjson.dumps([rev(*r) for r in revs])
+            yield b'%s%s:%s' % (separator, orjson.dumps(id), revs_json)
+            separator = b','
+        if separator == b'{':
+            yield separator  # empty object
+        yield b'}\n'
 
     async def write(self, doc):
-        params = {'new_edits': False}
         doc_json = await doc_to_couchdb_json(doc)
-        await self._request('PUT', f'/{doc.id}', params=params, json=doc_json)
+        await self._request('PUT', f'/{doc.id}', params=NO_NEW_EDITS_PARAMS,
+                            json=doc_json)
+
+    async def write_many(self, docs):
+        """Writes all documents in 'docs' using a single _bulk_docs request."""
+
+        if not docs:
+            return
+        # new_edits first, so the receiving end can write docs as they come
+        # in instead of holding them back until it knows new_edits
+        body = {'new_edits': False,
+                'docs': [await doc_to_couchdb_json(doc) for doc in docs]}
+        await self._request('POST', '/_bulk_docs', json=body)
 
     async def write_local(self, id, doc):
         await self._request('PUT', f'/_local/{id}', json=doc)
@@ -151,7 +186,7 @@ class HTTPDatabase(httpx.AsyncClient):
 
     async def _read(self, params, resp, tg):
         if resp.status_code == httpx.codes.NOT_FOUND:
-            message = json.loads(await resp.aread())
+            message = json_loads(await resp.aread())
             yield NotFound(message)
         else:
             assert resp.status_code == httpx.codes.OK
@@ -169,12 +204,12 @@ class HTTPDatabase(httpx.AsyncClient):
             parser = MultipartStreamParser(resp).__aiter__()
             part = await anext(parser)
             assert part.headers == {'Content-Type': 'application/json'}
-            doc, todo = couchdb_json_to_doc(json.loads(await part.aread()))
+            doc, todo = couchdb_json_to_doc(json_loads(await part.aread()))
             add_http_attachments(doc, todo, parser, tg)
             return doc
         else:
             assert resp.headers['Content-Type'] == 'application/json'
-            doc, todo = couchdb_json_to_doc(json.loads(await resp.aread()))
+            doc, todo = couchdb_json_to_doc(json_loads(await resp.aread()))
             assert not todo
             return doc
 
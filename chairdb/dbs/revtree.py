@@ -1,4 +1,5 @@
 import bisect
+import itertools
 import typing
 
 
@@ -45,12 +46,13 @@ class RevisionTree(list):
     If two branches are of equal length, they should be sorted by revision hash
     (from low -> high). This simplifies winner determination.
 
-    """
-    def __init__(self, branches=[]):
-        super().__init__(branches)
+    As Branch is a tuple starting with the leaf's revision number followed by
+    its path (i.e. its hash first), comparing branches directly gives exactly
+    that order.
 
-        # used to keep the tree sorted by leaf's revision number and hash
-        self._keys = [branch.leaf_rev_tuple for branch in self]
+    """
+    # one tree is kept (or decoded) per document, so skip the instance dict
+    __slots__ = ()
 
     def merge_with_path(self, doc_rev_num, doc_path):
         """Merges a document into the revision tree, storing 'doc' into a leaf
@@ -64,7 +66,12 @@ class RevisionTree(list):
         A maximum of 'revs_limit' old revisions are kept.
 
         """
-        for i in range(len(self) - 1, -1, -1):
+        # branches with a lower leaf revision number don't overlap with
+        # doc_path at all, so can't match any of the cases below. Skip them
+        # using the sort order.
+        min_leaf_rev_num = doc_rev_num + 1 - len(doc_path)
+        lowest_i = bisect.bisect(self, (min_leaf_rev_num,))
+        for i in range(len(self) - 1, lowest_i - 1, -1):
             branch = self[i]
             # 1. check if already in tree. E.g.:
             #
@@ -90,10 +97,11 @@ class RevisionTree(list):
                         branch.leaf_doc_ptr)
 
         # otherwise insert as a new leaf branch:
-        return self._insert_as_new_branch(doc_rev_num, doc_path)
+        return self._insert_as_new_branch(doc_rev_num, doc_path,
+                                          len(self) - lowest_i)
 
-    def _insert_as_new_branch(self, doc_rev_num, doc_path):
-        for branch in self.branches():
+    def _insert_as_new_branch(self, doc_rev_num, doc_path, candidate_count):
+        for branch in itertools.islice(self.branches(), candidate_count):
             # 3. try to find common history
             start_branch_rev_num = branch.leaf_rev_num + 1 - len(branch.path)
             start_doc_rev_num = doc_rev_num + 1 - len(doc_path)
@@ -117,18 +125,13 @@ class RevisionTree(list):
         if old_index is not None:
             # replace by removing the old branch first
             del self[old_index]
-            del self._keys[old_index]
 
         # stem using revs_limit
         assert revs_limit > 0, "invalid revs limit"
         path = path[:revs_limit]
 
-        new_branch = Branch(rev_num, path, ptr)
         # actual insertion using bisection
-        key = new_branch.leaf_rev_tuple
-        i = bisect.bisect(self._keys, key)
-        self._keys.insert(i, key)
-        self.insert(i, new_branch)
+        bisect.insort(self, Branch(rev_num, path, ptr))
 
     def find(self, rev_num, rev_hash):
         """Find the branches in which the revision specified by the arguments
@@ -171,9 +174,8 @@ class RevisionTree(list):
         rev hashes last)
 
         """
-        best_deleted_branch = None
-        for i, branch in enumerate(self.branches()):
+        for branch in self.branches():
             if branch.leaf_doc_ptr is not None:
                 return branch  # best non-deleted branch
-            best_deleted_branch = best_deleted_branch or branch
-        return best_deleted_branch
+        # all deleted, so the best deleted one (if any) it is
+        return self[-1] if self else None
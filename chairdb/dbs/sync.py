@@ -7,7 +7,7 @@ import contextlib
 
 class AbstractSyncDatabase:
     """Assumes (apart from read/write transaction) existance of:
-    - _changes
+    - _change_batches
 
     """
     def __init__(self, *args, **kwargs):
@@ -25,6 +25,9 @@ class AbstractSyncDatabase:
     def write_sync(self, doc):
         anyio.run(self._db.write, doc)
 
+    def write_many_sync(self, docs):
+        anyio.run(self._db.write_many, docs)
+
     def write_local_sync(self, id, doc):
         anyio.run(self._db.write_local, id, doc)
 
@@ -8,6 +8,8 @@ from .errors import NotFound
 from .datatypes import AttachmentSelector
 
 REPLICATION_ID_VERSION = 1
+# documents being fetched & written at the same time
+MAX_PARALLEL_CHANGES = 10
 
 
 async def replicate(source, target, create_target=False, continuous=False):
@@ -53,12 +55,16 @@ async def replicate(source, target, create_target=False, continuous=False):
     differences = target.revs_diff(diff_input)
 
     # 2.4.2.5. Replicate Changes
+    # acquired before starting a task, so the differences are only consumed
+    # as fast as documents can be replicated.
+    slots = anyio.Semaphore(MAX_PARALLEL_CHANGES)
     async with anyio.create_task_group() as tg:
         async for id, missing_revs, possible_ancestors in differences:
             opts = {'revs': missing_revs,
                     'atts': AttachmentSelector(since_revs=possible_ancestors)}
+            await slots.acquire()
             tg.start_soon(replicate_change, source, target, hist_entry, id,
-                          opts)
+                          opts, slots)
 
     # -  2.4.2.5.4. Ensure In Commit
     await target.ensure_full_commit()
@@ -150,7 +156,7 @@ async def revs_diff_input(changes, history_entry):
         history_entry['recorded_seq'] = change.seq
 
 
-async def replicate_change(source, target, history_entry, id, opts):
+async def replicate_change(source, target, history_entry, id, opts, slots):
     try:
         #  - 2.4.2.5.1. Fetch Changed Documents
         async with source.read_with_attachments(id, **opts) as result:
@@ -163,6 +169,8 @@ async def replicate_change(source, target, history_entry, id, opts):
     except Exception as e:
         raise
         print('read failure', repr(e))
+    finally:
+        slots.release()
 
 
 async def write_doc(target, doc, history_entry):
@@ -7,24 +7,28 @@ builds a full CouchDB-compatible server out of in-memory databases.
 """
 
 import anyio
+import ijson
 from starlette.applications import Starlette
 from starlette.endpoints import HTTPEndpoint
 from starlette.responses import Response, StreamingResponse
 from starlette.routing import Route
 
 import contextlib
+import decimal
 import functools
-import json
 import logging
-import uuid
+import re
+import secrets
 
 from ..utils import (as_json, json_object_inner, parse_json_stream, rev, anext,
                      couchdb_json_to_doc, parse_rev, doc_to_couchdb_json,
-                     json_array_inner, LocalDocument, add_http_attachments)
+                     json_array_inner, LocalDocument, add_http_attachments,
+                     ijson_backend, async_iter, stream_couchdb_json,
+                     has_attachment_data, has_small_body, json_loads)
 from ..datatypes import AttachmentSelector
 from ..errors import NotFound
 from ..multipart import MultipartStreamParser
-from .utils import JSONResp, parse_query_arg
+from .utils import JSONResp, ReadResponse, parse_query_arg, parse_query_args
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +42,11 @@ DOC_NOT_FOUND = {
     "reason": "missing",
 }
 
+RANGE_REGEX = re.compile(r'bytes=(\d*)-(\d*)$')
+
+# the amount of documents written using a single db.write_many() call
+BULK_DOCS_BATCH_SIZE = 256
+
 
 def get_db(request):
     try:
@@ -66,11 +75,12 @@ class Database(HTTPEndpoint):
 
 # changes
 async def changes(request):
-    if parse_query_arg(request, 'style', default='main_only') != 'all_docs':
+    args = parse_query_args(request, style='main_only', since=0,
+                            feed='normal')
+    if args['style'] != 'all_docs':
         logger.warn('style =/= all_docs, but we do that anyway!')
-    since = int(parse_query_arg(request, 'since', default=0))
-    feed = parse_query_arg(request, 'feed', default='normal')
-    continuous = feed == 'continuous'
+    since = int(args['since'])
+    continuous = args['feed'] == 'continuous'
 
     changes = get_db(request).changes(since, continuous)
     if continuous:
@@ -86,13 +96,16 @@ async def stream_changes_continuous(changes):
         yield f'{change_row_json(change)}\n'
 
 
-def change_row_json(change):
+# Like the other per-row encoders, this binds the helpers it uses as default
+# arguments: local lookups are cheaper than global ones, and this code runs
+# once per row of a potentially huge response.
+def change_row_json(change, _as_json=as_json, _rev=rev):
     id, seq, deleted, leaf_revs = change
-    changes = [{'rev': rev(*lr)} for lr in leaf_revs]
+    changes = [{'rev': _rev(*lr)} for lr in leaf_revs]
     row = {'seq': seq, 'id': id, 'changes': changes}
     if deleted:
         row['deleted'] = True
-    return as_json(row)
+    return _as_json(row)
 
 
 def stream_changes(changes):
@@ -114,7 +127,10 @@ def changes_footer(info):
 
 # revs diff
 async def revs_diff(request):
-    remote = parse_json_stream(request.stream(), 'kvitems', '')
+    if has_small_body(request):
+        remote = async_iter(json_loads(await request.body()).items())
+    else:
+        remote = parse_json_stream(request.stream(), 'kvitems', '')
     remote_parsed = parse_revs(remote)
     result = get_db(request).revs_diff(remote_parsed)
     gen = json_object_inner('{', revs_diff_json_items(result), lambda: '}\n')
@@ -126,12 +142,12 @@ async def parse_revs(data):
         yield id, [parse_rev(r) for r in revs]
 
 
-async def revs_diff_json_items(result):
+async def revs_diff_json_items(result, _as_json=as_json, _rev=rev):
     async for missing in result:
-        revs = [rev(*r) for r in missing.missing_revs]
-        pa = [rev(*r) for r in missing.possible_ancestors]
+        revs = [_rev(*r) for r in missing.missing_revs]
+        pa = [_rev(*r) for r in missing.possible_ancestors]
         value = {"missing": revs, "possible_ancestors": pa}
-        yield as_json(missing.id), as_json(value)
+        yield _as_json(missing.id), _as_json(value)
 
 
 # ensure full commit
@@ -142,10 +158,10 @@ async def ensure_full_commit(request):
 
 async def all_docs(request):
     info = {'total_rows': 0}
-    start_key = (parse_query_arg(request, 'start_key') or
-                 parse_query_arg(request, 'startkey'))
-    end_key = (parse_query_arg(request, 'end_key') or
-               parse_query_arg(request, 'endkey'))
+    args = parse_query_args(request, start_key=None, startkey=None,
+                            end_key=None, endkey=None)
+    start_key = args['start_key'] or args['startkey']
+    end_key = args['end_key'] or args['endkey']
     all_docs = get_db(request).all_docs(start_key=start_key, end_key=end_key)
     items = all_docs_json(all_docs, info)
     gen_footer = functools.partial(all_docs_footer, info)
@@ -154,10 +170,10 @@ async def all_docs(request):
     return StreamingResponse(generator, media_type='application/json')
 
 
-async def all_docs_json(all_docs, store):
+async def all_docs_json(all_docs, store, _as_json=as_json, _rev=rev):
     async for doc in all_docs:
-        r = rev(doc.rev_num, doc.path[0])
-        yield as_json({'id': doc.id, 'key': doc.id, 'value': {'rev': r}})
+        r = _rev(doc.rev_num, doc.path[0])
+        yield _as_json({'id': doc.id, 'key': doc.id, 'value': {'rev': r}})
         store['total_rows'] += 1
 
 
@@ -167,21 +183,85 @@ def all_docs_footer(info):
 
 # bulk docs
 async def bulk_docs(request):
-    req = await request.json()
-    assert not req.get('new_edits', True)
-
-    await write_all(get_db(request), req['docs'])
+    items = parse_bulk_docs(request.stream())
+    await write_all(get_db(request), hold_back_docs(items))
     return JSONResp([], 201)
 
 
+async def hold_back_docs(items):
+    """Only new_edits=false is supported, but it can come after the docs in
+    the body. Docs are held back until it has been seen, so nothing is written
+    for a request that turns out to be unsupported.
+
+    """
+    held_back, new_edits = [], True
+    async for prefix, value in items:
+        if prefix == 'new_edits':
+            new_edits = value
+            assert not new_edits
+        else:
+            held_back.append(value)
+        if not new_edits:
+            for doc in held_back:
+                yield doc
+            held_back.clear()
+    assert not new_edits
+
+
+async def parse_bulk_docs(stream):
+    """Streams (prefix, value) pairs for the docs and new_edits out of a
+    _bulk_docs body, without parsing all of it up front.
+
+    """
+    docs, new_edits = ijson.sendable_list(), ijson.sendable_list()
+    # no use_float=True, as that makes yajl2_c overflow on integers beyond 64
+    # bits. The Decimals returned for other numbers are converted instead.
+    coros = [
+        ijson_backend.items_coro(docs, 'docs.item'),
+        ijson_backend.items_coro(new_edits, 'new_edits'),
+    ]
+    async for chunk in stream:
+        for coro in coros:
+            with contextlib.suppress(StopIteration):
+                coro.send(chunk)
+        for doc in docs:
+            yield 'docs.item', decimals_as_floats(doc)
+        docs.clear()
+        for value in new_edits:
+            yield 'new_edits', value
+        new_edits.clear()
+
+
+def decimals_as_floats(value):
+    if isinstance(value, dict):
+        return {k: decimals_as_floats(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [decimals_as_floats(v) for v in value]
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
 async def write_all(db, docs):
-    for json_doc in docs:
+    batch = []
+    async for json_doc in docs:
         doc, todo = couchdb_json_to_doc(json_doc)
         assert not todo
         if isinstance(doc, LocalDocument):
-            await db.write_local(doc)
+            # write the docs before it first, to keep the request's order
+            await write_batch(db, batch)
+            await db.write_local(doc.id, doc.body)
         else:
-            await db.write(doc)
+            batch.append(doc)
+            if len(batch) == BULK_DOCS_BATCH_SIZE:
+                await write_batch(db, batch)
+    await write_batch(db, batch)
+
+
+async def write_batch(db, batch):
+    if batch:
+        await db.write_many(batch)
+        batch.clear()
 
 
 # /doc
@@ -194,67 +274,95 @@ class DocumentEndpoint(HTTPEndpoint):
     async def get(self, request):
         db = get_db(request)
         doc_id = self.doc_id(request)
-        revs, multi = self._parse_revs(request)
-        atts_since = parse_query_arg(request, 'atts_since', [])
-        atts = AttachmentSelector(since_revs=atts_since)
-        async with db.read_with_attachments(doc_id, revs=revs, atts=atts) as r:
-            if not parse_query_arg(request, 'revs', default=False):
-                logger.warn('revs=true not requested, but we do it anyway!')
-
-            if multi:
-                return await self._multi_response(r)
-            else:
-                return await self._single_response(request, await anext(r))
-
-    def _parse_revs(self, request):
-        rev = parse_query_arg(request, 'rev')
-        revs = parse_query_arg(request, 'open_revs')
+        args = parse_query_args(request, rev=None, open_revs=None,
+                                latest=None, atts_since=[], revs=False)
+        revs, multi = self._parse_revs(args)
+        atts = AttachmentSelector(since_revs=args['atts_since'])
+        if not args['revs']:
+            logger.warn('revs=true not requested, but we do it anyway!')
+
+        read = db.read_with_attachments(doc_id, revs=revs, atts=atts)
+        if multi:
+            return self._multi_response(read)
+        async with read as r:
+            return await self._single_response(request, await anext(r), atts)
+
+    def _parse_revs(self, args):
+        rev = args['rev']
+        revs = args['open_revs']
         # In the future, do whatever CouchDB decides to do:
         # https://github.com/apache/couchdb/issues/3362
         multi = revs is not None
         if revs is None and rev is not None:
             revs = [rev]
         if revs not in [None, 'all']:
-            if not parse_query_arg(request, 'latest'):
+            if not args['latest']:
                 logger.warn('latest=true not requested, but we do it anyway!')
             revs = [parse_rev(r) for r in revs]
         return revs, multi
 
-    async def _multi_response(self, docs):
+    def _multi_response(self, read):
         # multipart
-        boundary = uuid.uuid4().hex
+        boundary = secrets.token_hex(16)
         mt = f'multipart/mixed; boundary="{boundary}"'
-        generator = self._multipart_response(docs, boundary)
-        return StreamingResponse(generator, media_type=mt)
-
-    async def _multipart_response(self, items, boundary):
+        gen_body = functools.partial(self._multipart_response,
+                                     boundary=boundary)
+        return ReadResponse(read, gen_body, media_type=mt)
+
+    async def _multipart_response(self, items, boundary,
+                                  _to_json=stream_couchdb_json):
+        # the part header only depends on the boundary, so build it only once
+        header = (f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'
+                  .encode('UTF-8'))
+        # glue the bytes around each document to its (first) chunk, so the
+        # common case of a document without attachments becomes a single send
+        prefix = b''
         async for item in items:
-            yield f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'
-            yield f'{as_json(await doc_to_couchdb_json(item))}\r\n'
-        yield f'--{boundary}--'
-
-    async def _single_response(self, request, doc):
+            prefix += header
+            async for part in _to_json(item):
+                yield prefix + part
+                prefix = b''
+            prefix = b'\r\n'
+        yield prefix + f'--{boundary}--'.encode('UTF-8')
+
+    async def _single_response(self, request, doc, atts):
         if isinstance(doc, NotFound):
             return JSONResp(DOC_NOT_FOUND, 404)
         etag = f'"{rev(doc.rev_num, doc.path[0])}"'
         if request.headers.get('If-None-Match') == etag:
             resp = Response(status_code=304)
+        elif has_attachment_data(doc):
+            # don't buffer (possibly large) attachments. They're streamed
+            # from a new read of this revision, as the current one ends when
+            # the response is returned.
+            revs = [(doc.rev_num, doc.path[0])]
+            read = get_db(request).read_with_attachments(doc.id, revs=revs,
+                                                         atts=atts)
+            resp = ReadResponse(read, self._json_response,
+                                media_type='application/json',
+                                headers={'ETag': etag})
         else:
             json = await doc_to_couchdb_json(doc)
             resp = JSONResp(json, headers={'ETag': etag})
         return resp
 
+    async def _json_response(self, docs):
+        async for part in stream_couchdb_json(await anext(docs)):
+            yield part
+        yield b'\n'
+
     async def put(self, request):
         doc_id = self.doc_id(request)
         async with anyio.create_task_group() as tg:
             if request.headers['Content-Type'] == 'application/json':
-                doc, todo = couchdb_json_to_doc(await request.json(), doc_id)
+                doc_json = json_loads(await request.body())
+                doc, todo = couchdb_json_to_doc(doc_json, doc_id)
                 assert not todo
             else:
                 parser = MultipartStreamParser(request).__aiter__()
                 first = await anext(parser)
                 assert first.headers == {'Content-Type': 'application/json'}
-                doc_json = json.loads(await first.aread())
+                doc_json = json_loads(await first.aread())
                 doc, todo = couchdb_json_to_doc(doc_json, doc_id)
                 add_http_attachments(doc, todo, parser, tg)
 
@@ -287,6 +395,11 @@ class LocalDocumentEndpoint(DocumentEndpoint):
 
 
 class AttachmentEndpoint(HTTPEndpoint):
+    BASE_HEADERS = {
+        'Cache-Control': 'must-revalidate',
+        'Accept-Ranges': 'bytes',
+    }
+
     def info(self, request):
         return request.path_params['id'], request.path_params['attachment']
 
@@ -301,10 +414,9 @@ class AttachmentEndpoint(HTTPEndpoint):
             att = doc.attachments[att_name]
             etag = f'"{att.meta.digest}"'
             headers = {
+                **self.BASE_HEADERS,
                 'Content-Type': att.meta.content_type,
                 'ETag': etag,
-                'Cache-Control': 'must-revalidate',
-                'Accept-Ranges': 'bytes',
             }
             if request.headers.get('If-None-Match') == etag:
                 resp = Response(status_code=304, headers=headers)
@@ -319,7 +431,7 @@ class AttachmentEndpoint(HTTPEndpoint):
 
         range = self._get_range(request, etag)
         if range:
-            start, end = range.split('-')
+            start, end = range
             if not start:
                 start = att.meta.length - int(end)
                 end = length - 1
@@ -344,12 +456,11 @@ class AttachmentEndpoint(HTTPEndpoint):
         if header:
             condition = request.headers.get('If-Range')
             if not condition or condition == etag:
-                unit, ranges = header.split('=')
-                if unit == 'bytes':
-                    ranges = ranges.split(', ')
-                    # multipart ranges can alleviate the following check:
-                    if len(ranges) == 1:
-                        return ranges[0]
+                # multipart ranges could alleviate the need for only matching
+                # a single range here.
+                match = RANGE_REGEX.match(header)
+                if match and any(match.groups()):
+                    return match.groups()
 
 
 class DesignAttachmentEndpoint(AttachmentEndpoint):
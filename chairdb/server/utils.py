@@ -1,11 +1,35 @@
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
 import json
 
+from ..utils import json_dumps, async_iter
+
 
 class JSONResp(JSONResponse):
     def render(self, content):
-        return super().render(content) + b'\n'
+        return json_dumps(content) + b'\n'
+
+
+class ReadResponse(StreamingResponse):
+    """Streams the body generated by gen_body(docs), for the docs of 'read'
+    (a db.read_with_attachments() context manager). The context is only
+    entered while sending the response, so the read (e.g. a transaction) stays
+    open for as long as attachment data is streamed out of it.
+
+    """
+    def __init__(self, read, gen_body, **kwargs):
+        super().__init__(async_iter([]), **kwargs)
+        self._read = read
+        self._gen_body = gen_body
+
+    async def stream_response(self, send):
+        async with self._read as docs:
+            self.body_iterator = self._gen_body(docs)
+            try:
+                await super().stream_response(send)
+            finally:
+                # close it here, instead of outside the context
+                await self.body_iterator.aclose()
 
 
 def parse_query_arg(request, name, default=None):
@@ -14,7 +38,36 @@ def parse_query_arg(request, name, default=None):
         json_or_string = request.query_params[name]
     except KeyError:
         return default
-    # and try parsing it as json, returning it as-is if unsuccesful.
+    return parse_json_or_string(json_or_string)
+
+
+def parse_query_args(request, **defaults):
+    """Like parse_query_arg, but for multiple arguments at once. The keyword
+    arguments specify which arguments to parse, and their default values.
+
+    """
+    query_params = request.query_params
+    args = {}
+    for name, default in defaults.items():
+        try:
+            args[name] = parse_json_or_string(query_params[name])
+        except KeyError:
+            args[name] = default
+    return args
+
+
+# query arguments that can be parsed without invoking the JSON parser
+JSON_LITERALS = {'true': True, 'false': False, 'null': None}
+# the characters JSON can start with
+JSON_START = frozenset('[{"-0123456789tfnNI \t\n\r')
+
+
+def parse_json_or_string(json_or_string):
+    if json_or_string in JSON_LITERALS:
+        return JSON_LITERALS[json_or_string]
+    if json_or_string[:1] not in JSON_START:
+        return json_or_string  # e.g. feed=continuous, can't be JSON
+    # try parsing it as json, returning it as-is if unsuccesful.
     try:
         return json.loads(json_or_string)
     except ValueError:
@@ -1,43 +1,111 @@
 import aiosqlite
 import anyio
 
+import asyncio
 import contextlib
 
 MAX_PARALLEL_READS = 10
 
+# executed once for every new connection, as a single script to avoid a round
+# trip to the connection's thread per statement. In WAL mode,
+# synchronous=NORMAL can't corrupt the database, it can only lose the last
+# transactions on power loss.
+SETUP_CONNECTION = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+PRAGMA mmap_size=268435456;
+"""
+
 
 class SQLitePool:
     def __init__(self, url):
         self.url = url
         self.free = []
-        self.read_semaphore = anyio.Semaphore(MAX_PARALLEL_READS)
-        self.write_lock = anyio.Lock()
+        # aiosqlite only runs on asyncio anyway, so skip anyio's wrappers. An
+        # uncontended anyio.Semaphore takes a trip through the event loop on
+        # every acquire.
+        self.read_semaphore = asyncio.Semaphore(MAX_PARALLEL_READS)
+        self.write_lock = asyncio.Lock()
 
-    @contextlib.asynccontextmanager
-    async def _transaction(self):
+    async def _connection(self):
         try:
-            conn = self.free.pop()
+            return self.free.pop()
         except IndexError:
             conn = await aiosqlite.connect(self.url)
-            await conn.execute('PRAGMA journal_mode=WAL')
-        await conn.execute('BEGIN')
+            await conn.executescript(SETUP_CONNECTION)
+            return conn
+
+    def read_transaction(self):
+        return Transaction(self, self.read_semaphore, 'BEGIN')
+
+    def write_transaction(self):
+        # take the write lock immediately, instead of on the first write
+        return Transaction(self, self.write_lock, 'BEGIN IMMEDIATE')
+
+
+class Transaction:
+    """Checks out a connection from 'pool' for the duration of a transaction,
+    while holding 'guard'. Written out as a class instead of using
+    contextlib.asynccontextmanager, as one is entered for every request.
+
+    """
+    def __init__(self, pool, guard, begin):
+        self._pool = pool
+        self._guard = guard
+        self._begin = begin
+        self._conn = None
+
+    async def __aenter__(self):
+        await self._guard.acquire()
         try:
-            yield conn
-        except Exception:
-            await conn.execute('ROLLBACK')
+            self._conn = await self._pool._connection()
+            await self._conn.execute(self._begin)
+        except BaseException:
+            try:
+                await self._discard()
+            finally:
+                self._guard.release()
             raise
-        await conn.execute('COMMIT')
-        self.free.append(conn)
-
-    @contextlib.asynccontextmanager
-    async def read_transaction(self):
-        async with self.read_semaphore, self._transaction() as conn:
-            yield conn
-
-    @contextlib.asynccontextmanager
-    async def write_transaction(self):
-        async with self.write_lock, self._transaction() as conn:
-            yield conn
+        return self._conn
+
+    async def _discard(self):
+        if self._conn is not None:
+            # shielded and closed instead of reused, as a cancelled BEGIN
+            # might still have started a transaction
+            with anyio.CancelScope(shield=True):
+                await self._conn.close()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self._commit()
+            else:
+                await self._rollback()
+        finally:
+            self._guard.release()
+
+    async def _commit(self):
+        try:
+            await self._conn.execute('COMMIT')
+        except BaseException:
+            await self._rollback()
+            raise
+        self._pool.free.append(self._conn)
+
+    async def _rollback(self):
+        # shielded, as not even a cancelled transaction may leave its
+        # connection (and with it SQLite's locks) behind half-finished
+        with anyio.CancelScope(shield=True):
+            try:
+                await self._conn.execute('ROLLBACK')
+            except Exception:
+                # e.g. SQLite already rolled back by itself. Don't reuse a
+                # connection in an unknown state.
+                await self._conn.close()
+            else:
+                self._pool.free.append(self._conn)
 
 
 @contextlib.asynccontextmanager
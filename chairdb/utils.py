@@ -1,24 +1,77 @@
 import anyio
+import anyio.streams.memory
 import ijson
+import orjson
 
-import base64
 import contextlib
+import functools
 import json
+import operator
+import re
 import typing
 import zlib
 
 from .datatypes import (Document, AbstractDocument, AttachmentStub,
                         AttachmentMetadata)
 
+try:
+    # pybase64 is a SIMD-accelerated drop-in replacement for base64, which
+    # matters for attachment-heavy documents
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+try:
+    # ijson's C backend is much faster than its pure Python fallback, which
+    # matters for large _revs_diff and _changes bodies.
+    ijson_backend = ijson.get_backend('yajl2_c')
+except ImportError:
+    ijson_backend = ijson
+
+
+# the maximum size of the chunks gzipped attachments are decompressed into
+MAX_UNZIPPED_CHUNK_SIZE = 64 * 1024
+# JSON bodies up to this size are parsed in one go instead of streaming
+MAX_BUFFERED_BODY_SIZE = 1024 * 1024
+# read_attachment() preallocates buffers up to this size
+MAX_PREALLOCATED_ATTACHMENT_SIZE = 16 * 1024 * 1024
+# numbers with this many digits might not fit in 64 bits
+LONG_NUMBER = re.compile('[0-9]{19}')
+LONG_NUMBER_BYTES = re.compile(b'[0-9]{19}')
+
 
 # JSON helpers
 def as_json(item):
-    return json.dumps(item, separators=(",", ":"))
+    return json_dumps(item).decode('UTF-8')
+
+
+def json_dumps(item):
+    try:
+        return orjson.dumps(item, default=_tuple_as_list)
+    except TypeError:
+        # e.g. integers beyond 64 bits, which only json can encode
+        return json.dumps(item, separators=(',', ':')).encode('UTF-8')
+
+
+def _tuple_as_list(obj):
+    # orjson refuses tuple subclasses (e.g. Branch), json encodes them as lists
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError
+
+
+def json_loads(data):
+    # orjson silently parses integers beyond 64 bits as floats, so leave
+    # anything that might contain one to json
+    long_number = LONG_NUMBER_BYTES if isinstance(data, bytes) else LONG_NUMBER
+    if long_number.search(data):
+        return json.loads(data)
+    return orjson.loads(data)
 
 
 async def parse_json_stream(stream, type, prefix):
     results = ijson.sendable_list()
-    coro = getattr(ijson, type + '_coro')(results, prefix)
+    coro = getattr(ijson_backend, type + '_coro')(results, prefix)
     async for chunk in stream:
         with contextlib.suppress(StopIteration):
             coro.send(chunk)
@@ -27,15 +80,28 @@ async def parse_json_stream(stream, type, prefix):
         results.clear()
 
 
+def has_small_body(message):
+    """True if the request/response says its body can be parsed in one go,
+    which is faster than using parse_json_stream.
+
+    """
+    length = message.headers.get('Content-Length')
+    return length is not None and int(length) <= MAX_BUFFERED_BODY_SIZE
+
+
 async def json_array_inner(header, iterator, gen_footer):
-    text = header
-    async for i, item in aenumerate(iterator):
-        if i > 0:
-            yield text
-            text = f',\n{item}'
-        else:
-            text = f'{text}{item}'
-    yield f'{text}{gen_footer()}'
+    # the first item is handled up front, so the loop itself doesn't need to
+    # check for it on every iteration. Items are passed on as soon as they
+    # arrive, instead of being held back until the next one is known.
+    iterator = iterator.__aiter__()
+    try:
+        yield f'{header}{await anext(iterator)}'
+    except StopAsyncIteration:
+        yield header
+    else:
+        async for item in iterator:
+            yield f',\n{item}'
+    yield gen_footer()
 
 
 async def json_object_inner(header, iterator, gen_footer):
@@ -47,7 +113,8 @@ async def json_object_inner(header, iterator, gen_footer):
 
 # async helpers
 async def as_future_result(value):
-    await anyio.sleep(0)
+    # lets in-memory values be awaited like those of other databases. The
+    # value is known already, so there's no need to go through the event loop
     return value
 
 
@@ -79,7 +146,7 @@ def verify_no_attachments(opts):
 
 
 class LocalDocument(AbstractDocument):
-    pass
+    __slots__ = ()
 
 
 def couchdb_json_to_doc(json, id=None):
@@ -110,11 +177,15 @@ def couchdb_json_to_doc(json, id=None):
     return doc, todo
 
 
+# extracts the AttachmentMetadata fields from attachment json in one call
+get_attachment_meta = operator.itemgetter('revpos', 'content_type', 'length',
+                                          'digest')
+
+
 def parse_attachments(body, todo):
     atts = {}
     for name, info in body.pop('_attachments', {}).items():
-        meta = AttachmentMetadata(info['revpos'], info['content_type'],
-                                  info['length'], info['digest'])
+        meta = AttachmentMetadata(*get_attachment_meta(info))
         if info.pop('stub', False):
             atts[name] = AttachmentStub(meta)
         else:
@@ -140,33 +211,32 @@ class InMemoryAttachment(typing.NamedTuple):
         yield self.data  # async API
 
 
-async def doc_to_couchdb_json(doc):
-    try:
-        r = rev(doc.rev_num, doc.path[0])
-    except IndexError:
-        r = None  # for docs that were just created and are new edits
-    revs = {'start': doc.rev_num, 'ids': doc.path}
-    json = {'_id': doc.id, '_rev': r, '_revisions': revs}
-    if doc.attachments:
-        json['_attachments'] = await generate_attachments_json(doc)
+DELETED_BODY = {'_deleted': True}
 
-    if doc.is_deleted:
-        json['_deleted'] = True
-    else:
-        json.update(doc.body)
-    return json
+
+async def doc_to_couchdb_json(doc, att_data=True):
+    rev_num, path = doc.rev_num, doc.path
+    # no _rev for docs that were just created and are new edits
+    r = rev(rev_num, path[0]) if path else None
+    revs = {'start': rev_num, 'ids': path}
+    body = DELETED_BODY if doc.is_deleted else doc.body
+    if doc.attachments:
+        atts = await generate_attachments_json(doc, att_data)
+        return {'_id': doc.id, '_rev': r, '_revisions': revs,
+                '_attachments': atts, **body}
+    return {'_id': doc.id, '_rev': r, '_revisions': revs, **body}
 
 
-async def generate_attachments_json(doc):
+async def generate_attachments_json(doc, att_data=True):
     atts = {}
     for key, att in doc.attachments.items():
         if att.is_stub:
             result = {'stub': True}
-        else:
-            data = bytearray()
-            async for chunk in att:
-                data.extend(chunk)
+        elif att_data:
+            data = await read_attachment(att)
             result = {'data': base64.b64encode(data).decode('ascii')}
+        else:
+            result = {}
         atts[key] = {
             'content_type': att.meta.content_type,
             'digest': att.meta.digest,
@@ -177,6 +247,63 @@ async def generate_attachments_json(doc):
     return atts
 
 
+def has_attachment_data(doc):
+    return any(not att.is_stub for att in (doc.attachments or {}).values())
+
+
+async def stream_couchdb_json(doc):
+    """Like doc_to_couchdb_json, but yields the document as encoded JSON in
+    parts. Attachment data is base64 encoded chunk by chunk as it is read,
+    instead of being buffered completely first.
+
+    """
+    json = await doc_to_couchdb_json(doc, att_data=False)
+    atts = json.pop('_attachments', None)
+    if not atts:
+        yield json_dumps(json)
+        return
+    # leave the object open, so _attachments can be appended to it
+    yield json_dumps(json)[:-1] + b',"_attachments":{'
+    separator = b''
+    for name, info in atts.items():
+        yield separator + orjson.dumps(name) + b':' + orjson.dumps(info)[:-1]
+        async for part in _stream_attachment_data(doc.attachments[name]):
+            yield part
+        yield b'}'
+        separator = b','
+    yield b'}}'
+
+
+async def _stream_attachment_data(att):
+    if att.is_stub:
+        return
+    yield b',"data":"'
+    # base64 encodes groups of three bytes, so hold back what's left over
+    rest = b''
+    async for chunk in att:
+        chunk = rest + chunk
+        end = len(chunk) - len(chunk) % 3
+        yield base64.b64encode(chunk[:end])
+        rest = chunk[end:]
+    yield base64.b64encode(rest) + b'"'
+
+
+async def read_attachment(att):
+    # the length is known up front, so allocate the buffer only once instead
+    # of growing it chunk by chunk. It comes from (possibly replicated)
+    # metadata though, so don't trust it beyond a limit: past that, the buffer
+    # grows as data comes in.
+    length = min(max(att.meta.length, 0), MAX_PREALLOCATED_ATTACHMENT_SIZE)
+    data = bytearray(length)
+    offset = 0
+    async for chunk in att:
+        end = offset + len(chunk)
+        data[offset:end] = chunk
+        offset = end
+    del data[offset:]  # in case there was less data than announced
+    return data
+
+
 def add_http_attachments(doc, todo, parser, tg):
     send_streams = {}
     for name, meta in todo:
@@ -214,7 +341,11 @@ async def parse_atts(send_streams, parser):
 async def _unzip(chunks):
     decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
     async for chunk in chunks:
-        yield decompressor.decompress(chunk)
+        # limit the size of the output, as a small compressed chunk can
+        # expand into a huge one
+        while chunk:
+            yield decompressor.decompress(chunk, MAX_UNZIPPED_CHUNK_SIZE)
+            chunk = decompressor.unconsumed_tail
     yield decompressor.flush()
 
 
@@ -222,6 +353,9 @@ def rev(rev_num, rev_hash):
     return f'{rev_num}-{rev_hash}'
 
 
+@functools.lru_cache(maxsize=1 << 16)
 def parse_rev(rev):
-    num, hash = rev.split('-')
+    # cached, as the same revisions tend to come by repeatedly (e.g. when
+    # replicating, first as part of _revs_diff, later when reading the docs)
+    num, _, hash = rev.partition('-')
     return int(num), hash
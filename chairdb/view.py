@@ -1,3 +1,5 @@
+import anyio
+
 import contextlib
 import uuid
 import typing
@@ -8,6 +10,9 @@ from .datatypes import Document
 from .errors import NotFound
 from .utils import anext, verify_no_attachments
 
+# the amount of changes processed using a single view transaction
+BUILD_BATCH_SIZE = 256
+
 
 class View:
     def __init__(self, db, map, reduce=None, rereduce=None, name=None):
@@ -18,11 +23,36 @@ class View:
         self._reduce = reduce
         self._rereduce = rereduce
 
+        self._build_lock = anyio.Lock()
+
     async def build(self):
-        last_seq = await self._view_db.read_local('_local_seq')
-        async for change in self._db.changes(since=last_seq):
-            async with self._view_db.read_transaction() as view_rt:
-                await self._process_change(view_rt, change)
+        # concurrent queries would otherwise process the same changes at the
+        # same time. Now, they wait for the running build and then find little
+        # to nothing left to do.
+        async with self._build_lock:
+            last_seq = await self._view_db.read_local('_local_seq')
+            batch = []
+            async for change in self._db.changes(since=last_seq):
+                batch.append(change)
+                if len(batch) == BUILD_BATCH_SIZE:
+                    await self._process_changes(batch)
+                    batch = []
+            await self._process_changes(batch)
+
+    async def _process_changes(self, changes):
+        # every change in the feed is about a different document, so the
+        # changes in a batch can't affect each other's reads. That allows
+        # using a single read and write transaction for the whole batch.
+        if not changes:
+            return
+        async with self._view_db.read_transaction() as view_rt:
+            updates = [await self._process_change(view_rt, change)
+                       for change in changes]
+        async with self._view_db.write_transaction() as wt:
+            for update in updates:
+                self._write_update(wt, *update)
+            # and finally, update the meta doc
+            wt.write_local('_local_seq', changes[-1].seq)
 
     async def _process_change(self, view_rt, change):
         info = await view_rt.read_local(change.id)
@@ -40,19 +70,19 @@ class View:
             new_keys.append(key)
             new_docs.append(await self._build_new_doc(doc, key, value, view_rt,
                                                       old_docs))
-        async with self._view_db.write_transaction() as wt:
-            # write the new docs
-            for doc in new_docs:
-                wt.write(doc)
-            # delete the non-repurposed old docs:
-            for old_doc in old_docs.values():
-                old_doc.is_deleted = True
-                old_doc.update_rev()
-                wt.write(old_doc)
-            # update the delete index
-            wt.write_local(change.id, {'old_keys': new_keys})
-            # and finally, update the meta doc
-            wt.write_local('_local_seq', change.seq)
+        return change.id, new_docs, new_keys, old_docs
+
+    def _write_update(self, wt, id, new_docs, new_keys, old_docs):
+        # write the new docs
+        for doc in new_docs:
+            wt.write(doc)
+        # delete the non-repurposed old docs:
+        for old_doc in old_docs.values():
+            old_doc.is_deleted = True
+            old_doc.update_rev()
+            wt.write(old_doc)
+        # update the delete index
+        wt.write_local(id, {'old_keys': new_keys})
 
     async def _build_new_doc(self, doc, key, value, view_rt, old_docs):
         full_key = complex_key([key, doc.id])
@@ -43,18 +43,11 @@ async def get_url(request):
 
 async def popularity(request):
     # domain popularity: give the ten most popular domains
-    popcount_top = []
     aggregated = request.app.state.by_domain.aggregate(group_level=None)
-    async for domain, count in aggregated:
-        if len(popcount_top) < 10:
-            heapq.heappush(popcount_top, (count, domain))
-        else:
-            heapq.heappushpop(popcount_top, (count, domain))
+    counts = [(count, domain) async for domain, count in aggregated]
+    top = heapq.nlargest(10, counts)
 
-    for _ in range(len(popcount_top)):
-        popcount_top.append(heapq.heappop(popcount_top))
-
-    text = '\n'.join(f'{url} {count}'for count, url in reversed(popcount_top))
+    text = '\n'.join(f'{url} {count}' for count, url in top)
     return PlainTextResponse(text)
 
 
@@ -80,7 +73,19 @@ app = Starlette(routes=[
 
 
 def map(doc):
-    yield urlparse(doc['url']).netloc, None
+    yield netloc(doc['url']), None
+
+
+def netloc(url):
+    # cheap equivalent of urlparse(url).netloc for the absolute urls
+    # new_url accepts, as map runs for every changed document
+    start = url.find('//') + 2
+    end = len(url)
+    for char in '/?#':
+        i = url.find(char, start, end)
+        if i != -1:
+            end = i
+    return url[start:end]
 
 
 def reduce(key, value):
@@ -1,3 +1,4 @@
+import anyio
 import pytest
 
 import random
@@ -6,7 +7,7 @@ from chairdb import (InMemoryDatabase, SyncInMemoryDatabase, NotFound,
                      PreconditionFailed, Document, AttachmentMetadata,
                      AttachmentSelector, complex_key)
 from chairdb.datatypes import AttachmentStub, Change, Missing
-from chairdb.utils import async_iter, to_list, anext
+from chairdb.utils import async_iter, to_list, anext, read_attachment
 
 
 @pytest.fixture
@@ -84,6 +85,20 @@ def test_linear_history(db):
     ]
 
 
+def test_write_many(db):
+    docs = [
+        Document('test', 1, ('a',), {'hello': 'world'}),
+        Document('test2', 1, ('b',), {'hello': 'there'}),
+    ]
+    db.write_many_sync(docs)
+    doc_opts = {'body': True, 'atts': AttachmentSelector()}
+    assert list(db.all_docs_sync(doc_opts=doc_opts)) == docs
+    assert list(db.changes_sync()) == [
+        Change('test', seq=1, deleted=False, leaf_revs=[(1, 'a')]),
+        Change('test2', seq=2, deleted=False, leaf_revs=[(1, 'b')]),
+    ]
+
+
 def test_remove(db):
     insert_doc(db)
     doc2 = Document('test', 2, ('b', 'a'), is_deleted=True)
@@ -317,3 +332,56 @@ async def test_async(async_db):
     stub_doc.rev_num += 1
     stub_doc.path = ('b',) + stub_doc.path
     await async_db.write(stub_doc)
+
+
+@pytest.mark.anyio
+async def test_continuous_changes(async_db):
+    await async_db.write(Document('a', 1, ('a',), {}))
+    received = [[], []]
+
+    async def listen(result):
+        async for change in async_db.changes(continuous=True):
+            result.append(change)
+
+    async with anyio.create_task_group() as tg:
+        for result in received:
+            tg.start_soon(listen, result)
+        await anyio.wait_all_tasks_blocked()
+        await async_db.write(Document('b', 1, ('b',), {}))
+        await anyio.wait_all_tasks_blocked()
+        tg.cancel_scope.cancel()
+
+    expected = [
+        Change('a', seq=1, deleted=False, leaf_revs=[(1, 'a')]),
+        Change('b', seq=2, deleted=False, leaf_revs=[(1, 'b')]),
+    ]
+    assert received == [expected, expected]
+
+
+@pytest.mark.anyio
+async def test_write_many_same_id(async_db):
+    await async_db.write_many([
+        Document('a', 1, ('a',), {'v': 1}),
+        Document('a', 2, ('b', 'a'), {'v': 2}),
+        Document('a', 2, ('c', 'a'), {'v': 3}),
+    ])
+    assert await to_list(async_db.read('a', revs='all')) == [
+        Document('a', 2, ('c', 'a'), {'v': 3}),
+        Document('a', 2, ('b', 'a'), {'v': 2}),
+    ]
+
+
+class UntrustedAttachment:
+    def __init__(self, length, chunks):
+        self.meta = AttachmentMetadata(1, 'text/plain', length, 'md5-...')
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return async_iter(self.chunks)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('length', [-1, 0, 5, 2 ** 62])
+async def test_read_attachment_bogus_length(length):
+    att = UntrustedAttachment(length, [b'Hello', b' ', b'World!'])
+    assert await read_attachment(att) == b'Hello World!'
@@ -0,0 +1,46 @@
+import anyio
+import pytest
+
+import sqlite3
+
+from chairdb import SQLDatabase, Document, sqlite_pool
+from chairdb.sqlitepool import Transaction
+from chairdb.utils import anext
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def pool(tmp_path):
+    async with sqlite_pool(str(tmp_path / 'test.sqlite3')) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_cancelled_write_transaction(anyio_backend, pool):
+    db = SQLDatabase(pool)
+    await db.create()
+    with anyio.move_on_after(0.01) as scope:
+        async with pool.write_transaction() as conn:
+            await conn.execute('DELETE FROM revision_trees')
+            await anyio.sleep_forever()
+    assert scope.cancelled_caught
+
+    # the cancelled transaction must not keep holding SQLite's write lock
+    doc = Document('test', 1, ('a',), {'hello': 'world'})
+    with anyio.fail_after(1):
+        await db.write(doc)
+    assert await anext(db.read('test')) == doc
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_failed_begin(anyio_backend, pool):
+    transaction = Transaction(pool, pool.write_lock, 'BEGIN NONSENSE')
+    with pytest.raises(sqlite3.OperationalError):
+        async with transaction:
+            pass
+    assert not pool.free
+    assert not pool.write_lock.locked()
+    # the connection was closed instead of leaked
+    with pytest.raises(ValueError):
+        await transaction._conn.execute('SELECT 1')
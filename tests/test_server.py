@@ -0,0 +1,218 @@
+import anyio
+import pytest
+
+import json
+
+from chairdb import (InMemoryDatabase, SQLDatabase, Document, anext,
+                     sqlite_pool)
+from chairdb.sqlitepool import MAX_PARALLEL_READS
+from chairdb.server.db import build_db_app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def db_app():
+    db = InMemoryDatabase()
+    for i in range(100):
+        await db.write(Document(f'doc{i:03}', 1, ('a',), {'i': i}))
+    app = build_db_app()
+    app.state.db = db
+    return app
+
+
+def get_scope(path):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode('UTF-8'),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [],
+        'server': ('test', 80),
+        'client': ('test', 1234),
+    }
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_all_docs_disconnect(anyio_backend, db_app):
+    body_chunks = 0
+    disconnect = anyio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal body_chunks
+        if message['type'] == 'http.response.body':
+            body_chunks += 1
+            if body_chunks == 3:
+                disconnect.set()
+            await anyio.sleep(0)
+
+    # the client going away halfway through must not break the app
+    await db_app(get_scope('/_all_docs'), receive, send)
+    assert 3 <= body_chunks < 100
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_all_docs_cancel(anyio_backend, db_app):
+    body_chunks = 0
+
+    async def receive():
+        await anyio.sleep_forever()
+
+    async def send(message):
+        nonlocal body_chunks
+        if message['type'] == 'http.response.body':
+            body_chunks += 1
+            if body_chunks == 3:
+                scope.cancel()
+            await anyio.sleep(0)
+
+    with anyio.CancelScope() as scope:
+        await db_app(get_scope('/_all_docs'), receive, send)
+    assert scope.cancelled_caught
+    assert body_chunks == 3
+    # the host task's cancel scopes still work afterwards
+    with anyio.move_on_after(0.01) as inner:
+        await anyio.sleep_forever()
+    assert inner.cancelled_caught
+
+
+async def request(app, method, path, body=b'', headers=(), chunk_size=16,
+                  query_string=b''):
+    messages = [
+        {'type': 'http.request', 'body': body[i:i + chunk_size],
+         'more_body': i + chunk_size < len(body)}
+        for i in range(0, len(body), chunk_size)
+    ] or [{'type': 'http.request', 'body': b''}]
+    responses = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        responses.append(message)
+
+    scope = dict(get_scope(path), method=method, headers=list(headers),
+                 query_string=query_string)
+    await app(scope, receive, send)
+    body = b''.join(r.get('body', b'') for r in responses[1:])
+    return responses[0]['status'], body
+
+
+async def post(app, path, body):
+    status, _ = await request(app, 'POST', path, body)
+    return status
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_bulk_docs_new_edits_true(anyio_backend, db_app):
+    body = b'{"docs": [{"_id": "x", "_rev": "1-a"}]}'
+    with pytest.raises(AssertionError):
+        await post(db_app, '/_bulk_docs', body)
+    # rejected before writing anything
+    assert await db_app.state.db.update_seq == 100
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_bulk_docs_big_int(anyio_backend, db_app):
+    n = 123456789012345678901234567890
+    body = (b'{"new_edits": false, "docs": [{"_id": "a", "_rev": "1-a", '
+            b'"f": [1.5, {"g": -2e3}]}, {"_id": "x", "_rev": "1-a", '
+            b'"n": %d}]}' % n)
+    assert await post(db_app, '/_bulk_docs', body) == 201
+    db = db_app.state.db
+    body_a = (await anext(db.read('a'))).body
+    assert body_a == {'f': [1.5, {'g': -2000.0}]}
+    assert type(body_a['f'][0]) is float
+    assert (await anext(db.read('x'))).body == {'n': n}
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_put_get_big_int(anyio_backend, db_app):
+    n = 123456789012345678901234567890
+    body = b'{"_rev": "1-a", "n": %d}' % n
+    headers = [(b'content-type', b'application/json')]
+    status, _ = await request(db_app, 'PUT', '/p', body, headers,
+                              query_string=b'new_edits=false')
+    assert status == 201
+    assert (await anext(db_app.state.db.read('p'))).body == {'n': n}
+
+    status, body = await request(db_app, 'GET', '/p',
+                                 query_string=b'revs=true')
+    assert status == 200
+    assert json.loads(body)['n'] == n
+
+
+@pytest.fixture
+async def sql_app(tmp_path):
+    async with sqlite_pool(str(tmp_path / 'test.sqlite3')) as pool:
+        db = SQLDatabase(pool)
+        await db.create()
+        doc = Document('test', 1, ('a',), {'hello': 'world'})
+        doc.add_attachment('text.txt', [b'Hello World!'])
+        await db.write(doc)
+        app = build_db_app()
+        app.state.db = db
+        yield app, pool
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+@pytest.mark.parametrize('query_string', [
+    b'revs=true&attachments=true',
+    b'revs=true&open_revs=all&latest=true',
+])
+async def test_get_attachment_data_in_read(anyio_backend, sql_app,
+                                           query_string):
+    app, pool = sql_app
+    in_read = []
+
+    async def receive():
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            in_read.append(pool.read_semaphore._value < MAX_PARALLEL_READS)
+            body.append(message['body'])
+
+    body = []
+    scope = dict(get_scope('/test'), query_string=query_string)
+    await app(scope, receive, send)
+    assert b'SGVsbG8gV29ybGQh' in b''.join(body)
+    # the attachment data is read within the read transaction
+    assert all(in_read)
+    # which ends once the response has been sent
+    assert pool.read_semaphore._value == MAX_PARALLEL_READS
+
+
+class RecordingDatabase(InMemoryDatabase):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    async def write_many(self, docs):
+        self.writes.append([doc.id for doc in docs])
+        await super().write_many(docs)
+
+    async def write_local(self, id, doc):
+        self.writes.append(id)
+        await super().write_local(id, doc)
+
+
+@pytest.mark.parametrize('anyio_backend', ['asyncio'])
+async def test_bulk_docs_write_order(anyio_backend):
+    app = build_db_app()
+    app.state.db = db = RecordingDatabase()
+    body = (b'{"new_edits": false, "docs": ['
+            b'{"_id": "a", "_rev": "1-a"}, {"_id": "_local/l", "v": 1}, '
+            b'{"_id": "b", "_rev": "1-b"}, {"_id": "_local/m", "v": 2}]}')
+    assert await post(app, '/_bulk_docs', body) == 201
+    # in request order, without empty write_many() calls
+    assert db.writes == [['a'], 'l', ['b'], 'm']
@@ -52,3 +52,19 @@ async def test_view():
     assert await to_list(view.aggregate(group_level=2)) == group_result
 
     assert await to_list(view.aggregate(start_key='z')) == [(None, 0)]
+
+
+def map_any_value(doc):
+    yield doc['title'], doc['value']
+
+
+async def test_view_values():
+    db = InMemoryDatabase()
+    view = View(db, map_any_value)
+
+    values = [{1: 'one'}, 123456789012345678901234567890]
+    for i, value in enumerate(values):
+        await db.write(Document(f'test{i}', 1, ('a',),
+                                {'title': str(i), 'value': value}))
+    results = await to_list(view.query())
+    assert [result.value for result in results] == values